@@ -2,9 +2,14 @@
 """
 https://www.w3.org/TR/shacl/#sparql-constraint-components
 """
+import os
+import threading
 import typing
+import weakref
 
-from typing import Dict, List, Tuple, Type, Union
+from collections import ChainMap
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 import rdflib
 
@@ -22,6 +27,34 @@ if typing.TYPE_CHECKING:
 
 SH_SPARQLSelectValidator = SH.SPARQLSelectValidator
 SH_SPARQLAskValidator = SH.SPARQLAskValidator
+_SENTINEL = object()
+
+# Shared by all BoundShapeValidatorComponents, only created if parallel queries are enabled
+query_executor: Optional[ThreadPoolExecutor] = None
+query_executor_lock = threading.Lock()
+
+
+def get_query_executor() -> ThreadPoolExecutor:
+    global query_executor
+    with query_executor_lock:
+        if query_executor is None:
+            query_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="pyshacl-query")
+        return query_executor
+
+
+def get_only_object(graph: GraphLike, subject, predicate):
+    """
+    Get the one value of predicate on subject, stepping the objects iterator at most twice instead of
+    collecting all of the values.
+    :returns: The value, or _SENTINEL when there is not exactly one distinct value
+    """
+    objects = graph.objects(subject, predicate)
+    first = next(objects, _SENTINEL)
+    if first is _SENTINEL:
+        return _SENTINEL
+    # A ConjunctiveGraph gives the same value again for each named graph it is in
+    second = next((o for o in objects if o != first), _SENTINEL)
+    return first if second is _SENTINEL else _SENTINEL
 
 
 class BoundShapeValidatorComponent(ConstraintComponent):
@@ -48,6 +81,12 @@ class BoundShapeValidatorComponent(ConstraintComponent):
         )
         # Setting self.shape into QueryHelper automatically applies query_helper.bind_params and bind_messages
         self.query_helper.collect_prefixes()
+        # Without any sh:message on the validator, there is nothing to bind for each result
+        self.has_messages = len(self.query_helper.unbound_messages) > 0
+        # Messages without any {$var} or {?var} token are reported as they are, without binding them per result
+        self.messages_have_tokens = self.has_messages and any(
+            self.query_helper.find_msg_subs.search(str(m)) for m in self.query_helper.unbound_messages
+        )
 
     @classmethod
     def constraint_parameters(cls):
@@ -61,6 +100,68 @@ class BoundShapeValidatorComponent(ConstraintComponent):
     def make_generic_messages(self, datagraph: GraphLike, focus_node, value_node) -> List[rdflib.Literal]:
         return [rdflib.Literal("Parameterised SHACL Query generated constraint validation reports.")]
 
+    def validate_focus_nodes(self, target_graph: GraphLike, focus_value_nodes: Dict) -> List[Tuple[Any, List]]:
+        """
+        Run the validator on each focus node, returning the violations for each focus node in order.
+        When enabled on the ShapesGraph, results are taken from the query cache,
+        and the validator queries for different focus nodes are run concurrently.
+        :type focus_value_nodes: dict
+        :type target_graph: rdflib.Graph
+        """
+        query_helper = self.query_helper
+        validate = self.validator.validate
+        sg = self.shape.sg
+        if sg.query_cache_enabled and len(focus_value_nodes) > 0:
+            query_result_cache = sg.get_query_result_cache(target_graph)
+            param_binds = query_helper.param_bind_map
+            shared_binds, _, _, sparql_text = query_helper.prepare(extravars=param_binds.keys())
+            # Keyed on the bound query rather than on the shape, so different shapes applying the same
+            # constraint component with the same parameters (and path) to a focus node share one query run
+            cache_key_base = (
+                self.validator,
+                sparql_text,
+                frozenset(shared_binds.items()),
+                frozenset(param_binds.items()),
+            )
+        else:
+            query_result_cache = None
+            cache_key_base = None
+        executor = get_query_executor() if sg.parallel_queries_enabled and len(focus_value_nodes) > 1 else None
+        # Looking up the shared prepared query depends on the namespaces of the target graph, which
+        # don't change during evaluate, so it is done for the first focus node that needs it, not for each one.
+        prepared_query = None
+        focus_violations = []
+        cache_keys = []
+        for f, value_nodes in focus_value_nodes.items():
+            violations = None
+            cache_key = None
+            if query_result_cache is not None:
+                cache_key = (cache_key_base, f, frozenset(value_nodes))
+                violations = query_result_cache.get(cache_key, None)
+            if violations is None:
+                if prepared_query is None and len(value_nodes) > 0:
+                    _, _, _, sparql_text = query_helper.prepare(extravars=query_helper.param_bind_map.keys())
+                    prepared_query = query_helper.get_query_for_graph(sparql_text, target_graph)
+                if executor is not None:
+                    # Resolved below, once every focus node has been submitted
+                    violations = executor.submit(
+                        validate, f, value_nodes, target_graph, query_helper, None, prepared_query
+                    )
+                else:
+                    violations = validate(f, value_nodes, target_graph, query_helper, None, prepared_query)
+                    if cache_key is not None:
+                        query_result_cache[cache_key] = violations
+            focus_violations.append((f, violations))
+            cache_keys.append(cache_key)
+        if executor is not None:
+            for i, (f, violations) in enumerate(focus_violations):
+                if isinstance(violations, Future):
+                    violations = violations.result()
+                    focus_violations[i] = (f, violations)
+                    if cache_keys[i] is not None:
+                        query_result_cache[cache_keys[i]] = violations
+        return focus_violations
+
     def evaluate(self, target_graph: GraphLike, focus_value_nodes: Dict, _evaluation_path: List):
         """
         :type focus_value_nodes: dict
@@ -68,96 +169,132 @@ class BoundShapeValidatorComponent(ConstraintComponent):
         """
         reports = []
         non_conformant = False
-        extra_messages = self.constraint.messages or []
+        # A tuple, so the messages shared by every report can't be extended in place by one of them
+        extra_messages = tuple(self.constraint.messages or ())
         rept_kwargs = {
             # TODO, determine if we need sourceConstraint here
             #  'source_constraint': self.validator.node,
             'constraint_component': self.constraint.node,
             'extra_messages': extra_messages,
         }
-        for f, value_nodes in focus_value_nodes.items():
-            # we don't use value_nodes in the sparql constraint
-            # All queries are done on the corresponding focus node.
-            try:
-                violations = self.validator.validate(f, value_nodes, target_graph, self.query_helper)
-            except ValidationFailure as e:
-                raise e
+        # Hoist everything that doesn't change per focus node or per violation out of the loops below
+        query_helper = self.query_helper
+        bind_messages = query_helper.bind_messages
+        # param_bind_map doesn't change during evaluate, so the message args only layer the per-result
+        # bindings over it, instead of copying it for every violation
+        base_bind_map = query_helper.param_bind_map
+        messages_have_tokens = self.messages_have_tokens
+        unbound_messages = query_helper.unbound_messages
+        make_v_result = self.make_v_result
+        is_prop = self.shape.is_property_shape
+        shape_path = self.shape.path() if is_prop else None
+        # we don't use value_nodes in the sparql constraint
+        # All queries are done on the corresponding focus node.
+        for f, violations in self.validate_focus_nodes(target_graph, focus_value_nodes):
             for val, vio in violations:
                 non_conformant = True
-                msg_args_map = self.query_helper.param_bind_map.copy()
-                msg_args_map.update({"this": f, "value": val})
-                if self.shape.is_property_shape:
-                    msg_args_map['path'] = self.shape.path()
-                self.query_helper.bind_messages(msg_args_map)
-                bound_messages = self.query_helper.bound_messages
+                msg_args = {"this": f, "value": val}
+                if is_prop:
+                    msg_args['path'] = shape_path
+                if messages_have_tokens:
+                    bind_messages(ChainMap(msg_args, base_bind_map))
+                    bound_messages = query_helper.bound_messages
+                else:
+                    bound_messages = unbound_messages
                 # The DASH test suite likes _no_ value entry in the report if we're on a Property Shape.
-                report_val = val if not self.shape.is_property_shape else None
+                report_val = val if not is_prop else None
                 if isinstance(vio, bool):
                     if vio is False:  # ASKValidator Result
-                        new_kwargs = rept_kwargs.copy()
-                        new_kwargs['extra_messages'].extend(bound_messages)
-                        rept = self.make_v_result(target_graph, f, value_node=report_val, **new_kwargs)
+                        new_kwargs = {**rept_kwargs, 'extra_messages': [*extra_messages, *bound_messages]}
+                        rept = make_v_result(target_graph, f, value_node=report_val, **new_kwargs)
                     else:  # SELECTValidator Failure
                         raise ValidationFailure("Validation Failure generated by SPARQLConstraint.")
                 elif isinstance(vio, tuple):
                     t, p, v = vio
-                    new_msg_args_map = msg_args_map.copy()
+                    new_msg_args = msg_args.copy()
                     if v is None:
                         v = report_val
                     else:
-                        new_msg_args_map['value'] = v
+                        new_msg_args['value'] = v
                     if p is not None:
-                        new_msg_args_map['path'] = p
+                        new_msg_args['path'] = p
                     if t is not None:
-                        new_msg_args_map['this'] = t
-                    self.query_helper.bind_messages(new_msg_args_map)
-                    new_bound_msgs = self.query_helper.bound_messages
-                    new_kwargs = rept_kwargs.copy()
-                    new_kwargs['extra_messages'].extend(new_bound_msgs)
-                    rept = self.make_v_result(target_graph, t or f, value_node=v, result_path=p, **new_kwargs)
+                        new_msg_args['this'] = t
+                    if messages_have_tokens:
+                        bind_messages(ChainMap(new_msg_args, base_bind_map))
+                        new_bound_msgs = query_helper.bound_messages
+                    else:
+                        new_bound_msgs = unbound_messages
+                    new_kwargs = {**rept_kwargs, 'extra_messages': [*extra_messages, *new_bound_msgs]}
+                    rept = make_v_result(target_graph, t or f, value_node=v, result_path=p, **new_kwargs)
                 else:
-                    new_kwargs = rept_kwargs.copy()
-                    new_kwargs['extra_messages'].extend(bound_messages)
-                    rept = self.make_v_result(target_graph, f, value_node=report_val, **new_kwargs)
+                    new_kwargs = {**rept_kwargs, 'extra_messages': [*extra_messages, *bound_messages]}
+                    rept = make_v_result(target_graph, f, value_node=report_val, **new_kwargs)
                 reports.append(rept)
         return (not non_conformant), reports
 
 
 class SPARQLConstraintComponentValidator(object):
-    validator_cache: Dict[Tuple[int, str], Union['SelectConstraintValidator', 'AskConstraintValidator']] = {}
+    # Validators for each shapes graph, keyed on id() of the rdflib Graph. Each entry holds a weakref to that graph
+    # and the validators by node, and the entry is dropped when the graph is garbage collected.
+    validator_cache: Dict[
+        int, Tuple[weakref.ref, Dict[str, Union['SelectConstraintValidator', 'AskConstraintValidator']]]
+    ] = {}
+    validator_cache_lock = threading.Lock()
 
     def __new__(cls, shacl_graph: 'ShapesGraph', node, *args, **kwargs):
-        cache_key = (id(shacl_graph.graph), str(node))
-        found_in_cache = cls.validator_cache.get(cache_key, False)
-        if found_in_cache:
-            return found_in_cache
-        sg = shacl_graph.graph
-        type_vals = set(sg.objects(node, RDF_type))
-        validator_type: Union[Type[SelectConstraintValidator], Type[AskConstraintValidator], None] = None
-        if len(type_vals) > 0:
-            if SH_SPARQLSelectValidator in type_vals:
-                validator_type = SelectConstraintValidator
-            elif SH_SPARQLAskValidator in type_vals:
-                validator_type = AskConstraintValidator
-        if not validator_type:
-            sel_nodes = set(sg.objects(node, SH_select))
-            if len(sel_nodes) > 0:
+        with cls.validator_cache_lock:
+            graph_validators = cls._get_graph_validator_cache(shacl_graph.graph)
+            found_in_cache = graph_validators.get(str(node), False)
+            if found_in_cache:
+                return found_in_cache
+            sg = shacl_graph.graph
+            # Collect the types, sh:select and sh:ask of the validator in a single pass over its triples
+            type_vals = set()
+            has_select = False
+            has_ask = False
+            for _s, p, o in sg.triples((node, None, None)):
+                if p == RDF_type:
+                    type_vals.add(o)
+                elif p == SH_select:
+                    has_select = True
+                elif p == SH_ask:
+                    has_ask = True
+            validator_type: Union[Type[SelectConstraintValidator], Type[AskConstraintValidator], None] = next(
+                (v for t, v in SPARQL_VALIDATOR_TYPES.items() if t in type_vals), None
+            )
+            if not validator_type:
+                if has_select:
+                    # TODO:coverage: No test for this case
+                    validator_type = SelectConstraintValidator
+                elif has_ask:
+                    validator_type = AskConstraintValidator
+
+            if not validator_type:
                 # TODO:coverage: No test for this case
-                validator_type = SelectConstraintValidator
-        if not validator_type:
-            ask_nodes = set(sg.objects(node, SH_ask))
-            if len(ask_nodes) > 0:
-                validator_type = AskConstraintValidator
+                raise ConstraintLoadError(
+                    "Validator must be of type sh:SPARQLSelectValidator or sh:SPARQLAskValidator and must have either a sh:select or a sh:ask predicate.",
+                    "https://www.w3.org/TR/shacl/#ConstraintComponent",
+                )
+            validator = validator_type(shacl_graph, node, *args, **kwargs)
+            graph_validators[str(node)] = validator
+            return validator
 
-        if not validator_type:
-            # TODO:coverage: No test for this case
-            raise ConstraintLoadError(
-                "Validator must be of type sh:SPARQLSelectValidator or sh:SPARQLAskValidator and must have either a sh:select or a sh:ask predicate.",
-                "https://www.w3.org/TR/shacl/#ConstraintComponent",
-            )
-        validator = validator_type(shacl_graph, node, *args, **kwargs)
-        cls.validator_cache[cache_key] = validator
-        return validator
+    @classmethod
+    def _get_graph_validator_cache(cls, graph) -> Dict:
+        graph_id = id(graph)
+        try:
+            graph_ref, graph_validators = cls.validator_cache[graph_id]
+        except KeyError:
+            pass
+        else:
+            if graph_ref() is graph:
+                return graph_validators
+        graph_validators = {}
+        validator_cache = cls.validator_cache
+        graph_ref = weakref.ref(graph, lambda r: validator_cache.pop(graph_id, None))
+        validator_cache[graph_id] = (graph_ref, graph_validators)
+        return graph_validators
 
     def apply_to_shape_via_constraint(self, constraint, shape, **kwargs) -> BoundShapeValidatorComponent:
         """
@@ -190,7 +327,8 @@ class SPARQLConstraintComponentValidator(object):
         initialised = getattr(self, 'initialised', False)
         if initialised:
             return
-        self.shacl_graph = shacl_graph
+        # No reference to the ShapesGraph is kept. Cached validators are reused by every ShapesGraph wrapping the same
+        # rdflib graph, and must not keep that graph alive.
         self.node = node
         sg = shacl_graph.graph
         message_nodes = set(sg.objects(node, SH_message))
@@ -201,7 +339,8 @@ class SPARQLConstraintComponentValidator(object):
                     "Validator sh:message must be an RDF Literal of type xsd:string.",
                     "https://www.w3.org/TR/shacl/#ConstraintComponent",
                 )
-        self.messages = message_nodes
+        # A tuple in a fixed order, so reports list the messages the same way on every run
+        self.messages = tuple(sorted(message_nodes, key=str))
         self.initialised = True
 
     def make_messages(self, params_map=None):
@@ -226,14 +365,13 @@ class AskConstraintValidator(SPARQLConstraintComponentValidator):
     def __init__(self, shacl_graph: 'ShapesGraph', node, *args, **kwargs):
         super(AskConstraintValidator, self).__init__(shacl_graph, node, **kwargs)
         g = shacl_graph.graph
-        ask_vals = set(g.objects(node, SH_ask))
-        if len(ask_vals) < 1 or len(ask_vals) > 1:
+        ask_val = get_only_object(g, node, SH_ask)
+        if ask_val is _SENTINEL:
             # TODO:coverage: No test for this case
             raise ConstraintLoadError(
                 "AskValidator must have exactly one value for sh:ask.",
                 "https://www.w3.org/TR/shacl/#ConstraintComponent",
             )
-        ask_val = next(iter(ask_vals))
         if not (isinstance(ask_val, rdflib.Literal) and isinstance(ask_val.value, str)):
             # TODO:coverage: No test for this case
             raise ConstraintLoadError(
@@ -242,7 +380,7 @@ class AskConstraintValidator(SPARQLConstraintComponentValidator):
             )
         self.query_text = ask_val.value
 
-    def validate(self, focus, value_nodes, target_graph, query_helper=None, new_bind_vals=None):
+    def validate(self, focus, value_nodes, target_graph, query_helper=None, new_bind_vals=None, prepared_query=None):
         """
 
         :param focus:
@@ -251,34 +389,52 @@ class AskConstraintValidator(SPARQLConstraintComponentValidator):
         :param target_graph:
         :type target_graph: rdflib.Graph
         :param new_bind_vals:
+        :param prepared_query: The query from query_helper.get_query_for_graph(), if the caller already has it
         :return:
         """
         param_bind_vals = query_helper.param_bind_map if query_helper else {}
         new_bind_vals = new_bind_vals or {}
         bind_vals = param_bind_vals.copy()
         bind_vals.update(new_bind_vals)
-        violations = set()
+        violations = []
+        if len(value_nodes) < 1:
+            return violations
+        if query_helper is None:
+            # TODO:coverage: No test for this case when query_helper is None
+            init_binds = {}
+            bind_value = False
+            sparql_query = self.query_text
+        else:
+            shared_binds, bind_this, bind_value, sparql_text = query_helper.prepare(extravars=bind_vals.keys())
+            if prepared_query is not None:
+                sparql_query = prepared_query
+            else:
+                sparql_query = query_helper.get_query_for_graph(sparql_text, target_graph)
+            init_binds = {**shared_binds, **bind_vals}
+            if bind_this:
+                init_binds['this'] = focus
+        # When $value is not bound, the query gives the same answer for every value node, so only run it once.
+        unbound_answer = None
         for v in value_nodes:
-            if query_helper is None:
-                # TODO:coverage: No test for this case when query_helper is None
-                init_binds = {}
-                sparql_text = self.query_text
+            if bind_value and v:
+                answer = self._ask(target_graph, sparql_query, {**init_binds, 'value': v})
             else:
-                init_binds, sparql_text = query_helper.pre_bind_variables(
-                    focus, valuenode=v, extravars=bind_vals.keys()
-                )
-                sparql_text = query_helper.apply_prefixes(sparql_text)
-                init_binds.update(bind_vals)
-            try:
-                result = target_graph.query(sparql_text, initBindings=init_binds)
-                answer = result.askAnswer
-            except (KeyError, AttributeError):
-                # TODO:coverage: Can this ever actually happen?
-                raise ValidationFailure("ASK Query did not return an askAnswer.")
+                if unbound_answer is None:
+                    unbound_answer = self._ask(target_graph, sparql_query, init_binds)
+                answer = unbound_answer
             if answer is False:
-                violations.add((v, False))
+                violations.append((v, False))
         return violations
 
+    @classmethod
+    def _ask(cls, target_graph, sparql_query, init_binds):
+        try:
+            result = target_graph.query(sparql_query, initBindings=init_binds)
+            return result.askAnswer
+        except (KeyError, AttributeError):
+            # TODO:coverage: Can this ever actually happen?
+            raise ValidationFailure("ASK Query did not return an askAnswer.")
+
 
 class SelectConstraintValidator(SPARQLConstraintComponentValidator):
     def __new__(cls, shacl_graph: 'ShapesGraph', node, *args, **kwargs):
@@ -287,14 +443,13 @@ class SelectConstraintValidator(SPARQLConstraintComponentValidator):
     def __init__(self, shacl_graph: 'ShapesGraph', node, *args, **kwargs):
         super(SelectConstraintValidator, self).__init__(shacl_graph, node, **kwargs)
         g = shacl_graph.graph
-        select_vals = set(g.objects(node, SH_select))
-        if len(select_vals) < 1 or len(select_vals) > 1:
+        select_val = get_only_object(g, node, SH_select)
+        if select_val is _SENTINEL:
             # TODO:coverage: No test for this case, do we need to test this?
             raise ConstraintLoadError(
                 "SelectValidator must have exactly one value for sh:select.",
                 "https://www.w3.org/TR/shacl/#ConstraintComponent",
             )
-        select_val = next(iter(select_vals))
         if not (isinstance(select_val, rdflib.Literal) and isinstance(select_val.value, str)):
             # TODO:coverage: No test for the case when sh:select is not a literal of type string
             raise ConstraintLoadError(
@@ -303,7 +458,7 @@ class SelectConstraintValidator(SPARQLConstraintComponentValidator):
             )
         self.query_text = select_val.value
 
-    def validate(self, focus, value_nodes, target_graph, query_helper=None, new_bind_vals=None):
+    def validate(self, focus, value_nodes, target_graph, query_helper=None, new_bind_vals=None, prepared_query=None):
         """
 
         :param focus:
@@ -312,54 +467,103 @@ class SelectConstraintValidator(SPARQLConstraintComponentValidator):
         :param target_graph:
         :type target_graph: rdflib.Graph
         :param new_bind_vals:
+        :param prepared_query: The query from query_helper.get_query_for_graph(), if the caller already has it
         :return:
         """
         param_bind_vals = query_helper.param_bind_map if query_helper else {}
         new_bind_vals = new_bind_vals or {}
         bind_vals = param_bind_vals.copy()
         bind_vals.update(new_bind_vals)
-        violations = set()
+        violations = []
+        if len(value_nodes) < 1:
+            return violations
+        triple_pattern = None
+        if query_helper is None:
+            # TODO:coverage: No test for this case when query_helper is None
+            init_binds = {}
+            bind_value = False
+            sparql_query = self.query_text
+        else:
+            shared_binds, bind_this, bind_value, sparql_text = query_helper.prepare(extravars=bind_vals.keys())
+            if prepared_query is not None:
+                sparql_query = prepared_query
+            else:
+                sparql_query = query_helper.get_query_for_graph(sparql_text, target_graph)
+            init_binds = {**shared_binds, **bind_vals}
+            if bind_this:
+                init_binds['this'] = focus
+            # The SPARQL engine uses the default context of a ConjunctiveGraph, not the union of the
+            # graph triples, so only plain graphs can skip the engine. Query text goes to a store's own query().
+            if not isinstance(target_graph, rdflib.ConjunctiveGraph) and not isinstance(sparql_query, str):
+                triple_pattern = query_helper.get_select_triple_pattern(sparql_query)
+        # When $value is not bound, the query gives the same results for every value node, so only run it once.
+        unbound_results = None
         for v in value_nodes:
-            if query_helper is None:
-                # TODO:coverage: No test for this case when query_helper is None
-                init_binds = {}
-                sparql_text = self.query_text
+            if bind_value and v:
+                results = self._select(target_graph, sparql_query, {**init_binds, 'value': v}, triple_pattern)
             else:
-                init_binds, sparql_text = query_helper.pre_bind_variables(
-                    focus, valuenode=v, extravars=bind_vals.keys()
-                )
-                sparql_text = query_helper.apply_prefixes(sparql_text)
-                init_binds.update(bind_vals)
-            results = target_graph.query(sparql_text, initBindings=init_binds)
-            if not results or len(results.bindings) < 1:
-                continue
+                if unbound_results is None:
+                    unbound_results = self._select(target_graph, sparql_query, init_binds, triple_pattern)
+                results = unbound_results
             for r in results:
-                try:
-                    p = r['path']
-                except KeyError:
-                    p = None
-                try:
-                    v2 = r['value']
-                except KeyError:
-                    v2 = None
-                try:
-                    t = r['this']
-                except KeyError:
-                    # TODO:coverage: No test for when result has no 'this' key
-                    t = None
-                if p or v2 or t:
-                    violations.add((v, (t, p, v2)))
-                else:
-                    # TODO:coverage: No test for generic failure, when
-                    #  'path' and 'value' and 'this' are not returned.
-                    #  here 'failure' must exist
-                    try:
-                        f = r['failure']
-                        if f is True or (isinstance(f, rdflib.Literal) and f.value):
-                            violations.add((v, True))
-                    except KeyError:
-                        pass
-        return violations
+                violations.append((v, r))
+        # SELECT queries can return duplicate rows, drop those while keeping the result order
+        return list(dict.fromkeys(violations))
+
+    @classmethod
+    def _select(cls, target_graph, sparql_query, init_binds, triple_pattern=None):
+        if triple_pattern is not None:
+            rows = cls._select_triples(target_graph, triple_pattern, init_binds)
+        else:
+            results = target_graph.query(sparql_query, initBindings=init_binds)
+            if not results.bindings:
+                return []
+            # Unbound and unselected variables are both left out of the row dict
+            rows = (r.asdict() for r in results)
+        select_results = []
+        for row in rows:
+            p = row.get('path', None)
+            v2 = row.get('value', None)
+            # TODO:coverage: No test for when result has no 'this' key
+            t = row.get('this', None)
+            if p or v2 or t:
+                select_results.append((t, p, v2))
+            else:
+                # TODO:coverage: No test for generic failure, when
+                #  'path' and 'value' and 'this' are not returned.
+                #  here 'failure' must exist
+                f = row.get('failure', None)
+                if f is True or (isinstance(f, rdflib.Literal) and f.value):
+                    select_results.append(True)
+        return select_results
+
+    @classmethod
+    def _select_triples(cls, target_graph, triple_pattern, init_binds):
+        """
+        Get the same row dicts the query would give, for a query that is just one triple pattern.
+        :param triple_pattern: From SPARQLQueryHelper.get_select_triple_pattern()
+        :type triple_pattern: tuple
+        """
+        projection, pattern = triple_pattern
+        # Variables bound by initBindings are matched like constants, same as the SPARQL engine does
+        lookup = tuple(init_binds.get(str(t), None) if isinstance(t, rdflib.Variable) else t for t in pattern)
+        for triple in target_graph.triples(lookup):
+            solution = {str(t): triple[i] for i, t in enumerate(pattern) if isinstance(t, rdflib.Variable)}
+            row = {}
+            for var in projection:
+                val = solution.get(var, None)
+                if val is None:
+                    val = init_binds.get(var, None)
+                if val is not None:
+                    row[var] = val
+            yield row
+
+
+# Validator classes by rdf:type, in order of precedence
+SPARQL_VALIDATOR_TYPES: Dict[rdflib.URIRef, Union[Type[SelectConstraintValidator], Type[AskConstraintValidator]]] = {
+    SH_SPARQLSelectValidator: SelectConstraintValidator,
+    SH_SPARQLAskValidator: AskConstraintValidator,
+}
 
 
 class SPARQLConstraintComponent(CustomConstraintComponent):
@@ -369,12 +573,32 @@ class SPARQLConstraintComponent(CustomConstraintComponent):
     https://www.w3.org/TR/shacl/#sparql-constraint-components
     """
 
-    __slots__: Tuple = tuple()
+    __slots__: Tuple = ('_node_validator', '_property_validator')
+
+    if typing.TYPE_CHECKING:
+        _node_validator: Optional[Tuple[Any, bool, bool]]
+        _property_validator: Optional[Tuple[Any, bool, bool]]
 
     def __new__(cls, shacl_graph, node, parameters, validators, node_validators, property_validators):
-        return super(SPARQLConstraintComponent, cls).__new__(
+        self = super(SPARQLConstraintComponent, cls).__new__(
             cls, shacl_graph, node, parameters, validators, node_validators, property_validators
         )
+        # The validator to use for node shapes and for property shapes doesn't change, so pick both once here.
+        # Each is (validator_node, must_be_ask_val, must_be_select_val), or None when there is no usable validator.
+        # https://www.w3.org/TR/shacl/#constraint-components-validators
+        if len(validators) > 0:
+            fallback = (next(iter(validators)), True, False)
+        else:
+            fallback = None
+        if len(node_validators) > 0:
+            self._node_validator = (next(iter(node_validators)), False, True)
+        else:
+            self._node_validator = fallback
+        if len(property_validators) > 0:
+            self._property_validator = (next(iter(property_validators)), False, True)
+        else:
+            self._property_validator = fallback
+        return self
 
     @property
     def messages(self):
@@ -387,25 +611,13 @@ class SPARQLConstraintComponent(CustomConstraintComponent):
         :type shape: Shape
         :return:
         """
-        val_count = len(self.validators)
-        node_val_count = len(self.node_validators)
-        prop_val_count = len(self.property_validators)
-        must_be_select_val = False
-        must_be_ask_val = False
-        if shape.is_property_shape and prop_val_count > 0:
-            validator_node = next(iter(self.property_validators))
-            must_be_select_val = True
-        elif (not shape.is_property_shape) and node_val_count > 0:
-            validator_node = next(iter(self.node_validators))
-            must_be_select_val = True
-        elif val_count > 0:
-            validator_node = next(iter(self.validators))
-            must_be_ask_val = True
-        else:
+        picked = self._property_validator if shape.is_property_shape else self._node_validator
+        if picked is None:
             raise ConstraintLoadError(
                 "Cannot select a validator to use, according to the rules.",
                 "https://www.w3.org/TR/shacl/#constraint-components-validators",
             )
+        validator_node, must_be_ask_val, must_be_select_val = picked
 
         validator = SPARQLConstraintComponentValidator(self.sg, validator_node)
         applied_validator = validator.apply_to_shape_via_constraint(
@@ -148,7 +148,8 @@ class SPARQLFunction(SHACLFunction):
             return self.execute_select(g, init_bindings)
 
     def execute_select(self, g: 'GraphLike', init_bindings: Dict):
-        s = self._qh.apply_prefixes(self.select)
+        # A prepared query is parsed under the query helper's lock, these can run in the parallel query threads
+        s = self._qh.get_query_for_graph(str(self.select), g)
         results = g.query(s, initBindings=init_bindings)
         if results.type != "SELECT":
             raise ReportableRuntimeError("Was expecting an SELECT response from the Select query.")
@@ -161,7 +162,7 @@ class SPARQLFunction(SHACLFunction):
         return result[rvar]
 
     def execute_ask(self, g: 'GraphLike', init_bindings: Dict):
-        a = self._qh.apply_prefixes(self.ask)
+        a = self._qh.get_query_for_graph(str(self.ask), g)
         results = g.query(a, initBindings=init_bindings)
         if results.type != "ASK":
             raise ReportableRuntimeError("Was expecting an ASK response from the Ask query.")
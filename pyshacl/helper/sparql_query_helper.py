@@ -3,10 +3,16 @@
 https://www.w3.org/TR/shacl/#sparql-constraints
 """
 import re
+import threading
+
+from functools import lru_cache
 
 import rdflib
 
 from rdflib import XSD
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.stores.memory import Memory, SimpleMemory
+from rdflib.store import Store
 
 from ..consts import (
     OWL_PFX,
@@ -30,6 +36,69 @@ from ..errors import ConstraintLoadError, ReportableRuntimeError, ValidationFail
 
 SH_declare = SH.declare
 invalid_parameter_names = {'this', 'shapesGraph', 'currentShape', 'path', 'PATH', 'value'}
+# rdflib's SPARQL parser is not thread-safe, and queries can be prepared from the parallel query threads.
+# Validator and SHACL function queries run by rdflib are always prepared here, query text is only given to stores
+# that run their own queries.
+prepare_query_lock = threading.Lock()
+# These store query() methods only raise NotImplementedError, so rdflib's own SPARQL engine runs the query
+engine_store_queries = {Store.query, Memory.query, SimpleMemory.query}
+
+
+def store_runs_own_queries(graph):
+    """
+    Check if the store behind graph answers SPARQL queries itself (like SPARQLStore does),
+    those stores are passed the query and can only take query text, not a prepared query.
+    :type graph: rdflib.Graph
+    :rtype: bool
+    """
+    return type(graph.store).query not in engine_store_queries
+
+
+@lru_cache(maxsize=512)
+def prepare_query_with_prefixes(sparql_text, prefixes):
+    """
+    Parse and translate a SPARQL query once, so equivalent queries share the same prepared Query object.
+    :param sparql_text: The SPARQL query text, without the PREFIX declarations
+    :type sparql_text: str
+    :param prefixes: The prefix to namespace pairs to declare on the query
+    :type prefixes: frozenset
+    :rtype: rdflib.plugins.sparql.sparql.Query
+    """
+    with prepare_query_lock:
+        return prepareQuery(sparql_text, initNs=dict(prefixes))
+
+
+@lru_cache(maxsize=512)
+def select_triple_pattern(sparql_query):
+    """
+    Check if a prepared SELECT query is just a single triple pattern, like
+    SELECT $this ?value WHERE { $this ex:p ?value . }
+    Those can be answered with graph.triples() directly, without going through the SPARQL engine.
+    :param sparql_query: A prepared SPARQL Query
+    :type sparql_query: rdflib.plugins.sparql.sparql.Query
+    :return: A tuple of (projected variable names, triple pattern), or None if the query is not that simple
+    :rtype: tuple | None
+    """
+    algebra = sparql_query.algebra
+    if algebra.name != "SelectQuery" or algebra.get('datasetClause', None):
+        return None
+    project = algebra.p
+    # Any modifier (DISTINCT, ORDER BY, LIMIT, etc) wraps the Project, and any FILTER, BIND, OPTIONAL
+    # or other graph pattern replaces the BGP, so both of those fall back to the full query.
+    if project.name != "Project" or project.p.name != "BGP":
+        return None
+    triples = project.p.triples
+    if len(triples) != 1:
+        return None
+    pattern = triples[0]
+    variables = [t for t in pattern if isinstance(t, rdflib.Variable)]
+    if len(variables) != len(set(variables)):
+        return None
+    for t in pattern:
+        # Blank nodes in a query are variables, and property paths need the SPARQL path evaluator
+        if not isinstance(t, (rdflib.Variable, rdflib.URIRef, rdflib.Literal)):
+            return None
+    return tuple(str(v) for v in project.PV), tuple(pattern)
 
 
 class SPARQLQueryHelper(object):
@@ -45,22 +114,26 @@ class SPARQLQueryHelper(object):
         r"SELECT[\s\(\)\$\?\a-z]*\{[^\}]*SELECT\s+((?:(?:[\?\$]\w+\s+)|(?:\*\s+))+)", flags=re.M | re.I
     )
     has_as_var_regex = re.compile(r"[^\w]+AS[\s]+[\$\?](\w+)", flags=re.M | re.I)
-    find_msg_subs = re.compile(r"({[\$\?](.+)})", flags=re.M)
+    find_msg_subs = re.compile(r"{[\$\?](\w+)}", flags=re.M)
 
     def __init__(self, shape, node, select_text, parameters=None, messages=None, deactivated=False):
         self._shape = None
         self.node = node
         self.select_text = select_text
-        self.unbound_messages = messages or set()
+        self.unbound_messages = messages or ()
         self.deactivated = deactivated
         self.parameters = [] if parameters is None else parameters
         self.param_bind_map = {}
-        self.bound_messages = set()
+        self.bound_messages = ()
         self.prefixes = {
             'rdf': RDF_PFX,
             'rdfs': RDFS_PFX,
             'owl': OWL_PFX,
         }
+        self._prefix_string = None
+        self._prefixed_query_text = None
+        self._prepared_queries = {}
+        self._prepared = None
         if shape:
             self.shape = shape
 
@@ -105,26 +178,26 @@ class SPARQLQueryHelper(object):
         # must call bind_params _before_ bind_messages
         if param_map is None:
             param_map = self.param_bind_map
-        var_replacers = {}
-        bound_messages = set()
+
+        def _param_text(match):
+            # Substitute every {$var} and {?var} token in a message in a single pass
+            try:
+                v = param_map[match.group(1)]
+            except KeyError:
+                return match.group(0)
+            if isinstance(v, rdflib.Literal):
+                v = v.value
+            return str(v)
+
+        # A dict rather than a set, to drop duplicates but keep the messages in order
+        bound_messages = {}
         for m in self.unbound_messages:
             m_val = str(m.value)
-            finds = self.find_msg_subs.findall(m_val)
-            if len(finds) < 1:
-                bound_messages.add(m)
-                continue
-            for f in finds:
-                variable = f[1]
-                if variable not in param_map.keys():
-                    continue
-                try:
-                    replacer = var_replacers[variable]
-                except KeyError:
-                    replacer = re.compile(r"{[\$\?]" + variable + r"}", flags=re.M)
-                    var_replacers[variable] = replacer
-                m_val = replacer.sub(str(param_map[variable].value), m_val, 1)
-            bound_messages.add(rdflib.Literal(m_val, lang=m.language, datatype=m.datatype))
-        self.bound_messages = bound_messages
+            new_val = self.find_msg_subs.sub(_param_text, m_val)
+            if new_val != m_val:
+                m = rdflib.Literal(new_val, lang=m.language, datatype=m.datatype)
+            bound_messages[m] = None
+        self.bound_messages = tuple(bound_messages)
 
     def collect_prefixes(self):
         sg = self.shape.sg.graph
@@ -191,12 +264,74 @@ class SPARQLQueryHelper(object):
                         )
                 namespace = rdflib.URIRef(str(namespace.value))
                 self.prefixes[prefix] = namespace
+        # Any queries prefixed or prepared before now were done with the old prefixes
+        self._prefix_string = None
+        self._prefixed_query_text = None
+        self._prepared_queries.clear()
+
+    @property
+    def prefix_string(self):
+        if self._prefix_string is None:
+            prefix_string = ""
+            for p, ns in self.prefixes.items():
+                prefix_string += "PREFIX {}: <{}>\n".format(str(p), str(ns))
+            self._prefix_string = prefix_string
+        return self._prefix_string
+
+    @property
+    def prefixed_query_text(self):
+        if self._prefixed_query_text is None:
+            self._prefixed_query_text = self.apply_prefixes(self.select_text)
+        return self._prefixed_query_text
 
     def apply_prefixes(self, sparql):
-        prefix_string = ""
-        for p, ns in self.prefixes.items():
-            prefix_string += "PREFIX {}: <{}>\n".format(str(p), str(ns))
-        return "{}\n{}".format(prefix_string, sparql)
+        return "{}\n{}".format(self.prefix_string, sparql)
+
+    def get_prepared_query(self, sparql_text, target_graph=None):
+        """
+        Get a prepared (parsed and translated) version of the sparql_text, with this helper's prefixes applied.
+        Like rdflib does when querying a graph with query text, the namespaces bound on the target_graph can
+        be used in the query too, but this helper's prefixes take precedence over them.
+        :param sparql_text:
+        :type sparql_text: str
+        :param target_graph: The graph the prepared query will be run against
+        :type target_graph: rdflib.Graph | None
+        :rtype: rdflib.plugins.sparql.sparql.Query
+        """
+        graph_namespaces = frozenset(target_graph.namespaces()) if target_graph is not None else frozenset()
+        memo_key = (sparql_text, graph_namespaces)
+        try:
+            return self._prepared_queries[memo_key]
+        except KeyError:
+            pass
+        prefixes = dict(graph_namespaces)
+        prefixes.update(self.prefixes)
+        prepared = prepare_query_with_prefixes(sparql_text, frozenset(prefixes.items()))
+        self._prepared_queries[memo_key] = prepared
+        return prepared
+
+    def get_query_for_graph(self, sparql_text, target_graph):
+        """
+        Get the query to pass to target_graph.query(). That is the prepared query when rdflib's SPARQL engine
+        runs it, or the query text with this helper's prefixes applied when the graph's store runs its own queries.
+        :param sparql_text:
+        :type sparql_text: str
+        :param target_graph: The graph the query will be run against
+        :type target_graph: rdflib.Graph
+        :rtype: rdflib.plugins.sparql.sparql.Query | str
+        """
+        if store_runs_own_queries(target_graph):
+            return self.apply_prefixes(sparql_text)
+        return self.get_prepared_query(sparql_text, target_graph)
+
+    def get_select_triple_pattern(self, sparql_query):
+        """
+        See select_triple_pattern()
+        :param sparql_query: A prepared SPARQL Query, from get_prepared_query()
+        :type sparql_query: rdflib.plugins.sparql.sparql.Query
+        :rtype: tuple | None
+        """
+        return select_triple_pattern(sparql_query)
 
     def _shacl_path_to_sparql_path(self, path_val, recursion=0):
         """
@@ -385,3 +520,22 @@ class SPARQLQueryHelper(object):
                 )
 
         return init_bindings, new_query_text
+
+    def prepare(self, extravars=None):
+        """
+        Do the part of pre-binding that doesn't depend on the focus node or the value nodes, only once.
+        The query text is checked and has $PATH substituted on the first call, and the result is reused after that.
+        :param extravars: The names of the extra variables that will be bound, these must be the same on every call
+        :returns: The init_bindings shared by all focus nodes, whether to bind $this, whether to bind $value,
+                  and the new query text
+        :rtype: tuple
+        """
+        if self._prepared is None:
+            # Any node will do here, they are only used to find out whether $this and $value get bound
+            init_bindings, new_query_text = self.pre_bind_variables(
+                self.node, valuenode=self.node, extravars=extravars
+            )
+            bind_this = init_bindings.pop('this', None) is not None
+            bind_value = init_bindings.pop('value', None) is not None
+            self._prepared = (init_bindings, bind_this, bind_value, new_query_text)
+        return self._prepared
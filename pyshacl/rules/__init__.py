@@ -94,6 +94,9 @@ def apply_rules(shapes_rules: Dict, data_graph: GraphLike, iterate=False) -> int
                 if r.deactivated:
                     continue
                 n_modified = r.apply(data_graph)
+                if n_modified > 0:
+                    # Query results cached while checking rule conditions are stale now that the graph changed
+                    shape.sg.clear_query_result_cache()
                 this_modified += n_modified
             if this_modified > 0:
                 total_modified += this_modified
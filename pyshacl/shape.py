@@ -361,8 +361,7 @@ class Shape(object):
             for at_node, at in advanced_targets.items():
                 if at['type'] == SH_SPARQLTarget:
                     qh = at['qh']
-                    select = qh.apply_prefixes(qh.select_text)
-                    results = data_graph.query(select, initBindings=None)
+                    results = data_graph.query(qh.prefixed_query_text, initBindings=None)
                     if not results or len(results.bindings) < 1:
                         continue
                     for r in results:
@@ -54,6 +54,9 @@ class ShapesGraph(object):
         self._shacl_functions = {}
         self._shacl_target_types = {}
         self._use_js = False
+        self._use_query_cache = False
+        self._query_result_cache = {}
+        self._use_parallel_queries = False
         self._add_system_triples()
 
     def enable_js(self):
@@ -63,6 +66,32 @@ class ShapesGraph(object):
     def js_enabled(self):
         return bool(self._use_js)
 
+    def enable_query_cache(self):
+        self._use_query_cache = True
+
+    @property
+    def query_cache_enabled(self):
+        return bool(self._use_query_cache)
+
+    def get_query_result_cache(self, target_graph):
+        """
+        Get the cache of SPARQL-based constraint component query results for target_graph.
+        Results are only kept for one validation run, see clear_query_result_cache().
+        :type target_graph: rdflib.Graph
+        :rtype: dict
+        """
+        return self._query_result_cache.setdefault(id(target_graph), {})
+
+    def clear_query_result_cache(self):
+        self._query_result_cache = {}
+
+    def enable_parallel_queries(self):
+        self._use_parallel_queries = True
+
+    @property
+    def parallel_queries_enabled(self):
+        return bool(self._use_parallel_queries)
+
     def _add_system_triples(self):
         if isinstance(self.graph, (rdflib.Dataset, rdflib.ConjunctiveGraph)):
             g = next(iter(self.graph.contexts()))
@@ -144,8 +144,7 @@ class BoundSPARQLTargetType(BoundSHACLTargetType):
         # Don't pre-bind variables here!
         # init_binds, sparql_text = qh.pre_bind_variables(self.target_type.node, extravars=bind_vals.keys())
         # init_binds.update(bind_vals)
-        sparql_text = qh.apply_prefixes(qh.select_text)
-        results = data_graph.query(sparql_text, initBindings=bind_vals)
+        results = data_graph.query(qh.prefixed_query_text, initBindings=bind_vals)
         return results
 
 
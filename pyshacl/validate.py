@@ -64,6 +64,8 @@ class Validator(object):
         options_dict.setdefault('iterate_rules', False)
         options_dict.setdefault('abort_on_first', False)
         options_dict.setdefault('allow_warnings', False)
+        options_dict.setdefault('query_cache', False)
+        options_dict.setdefault('parallel_queries', False)
         if 'logger' not in options_dict:
             options_dict['logger'] = logging.getLogger(__name__)
 
@@ -190,6 +192,10 @@ class Validator(object):
             is_js_installed = check_extra_installed('js')
             if is_js_installed:
                 self.shacl_graph.enable_js()
+        if options['query_cache']:
+            self.shacl_graph.enable_query_cache()
+        if options['parallel_queries']:
+            self.shacl_graph.enable_parallel_queries()
 
     @property
     def target_graph(self):
@@ -242,6 +248,8 @@ class Validator(object):
         else:
             named_graphs = [the_target_graph]
         reports = []
+        # The data graph can change between runs, so cached query results are only used within one run
+        self.shacl_graph.clear_query_result_cache()
         abort_on_first: bool = bool(self.options.get("abort_on_first", False))
         allow_warnings: bool = bool(self.options.get("allow_warnings", False))
         non_conformant = False
@@ -249,7 +257,8 @@ class Validator(object):
         for g in named_graphs:
             if advanced:
                 apply_functions(advanced['functions'], g)
-                apply_rules(advanced['rules'], g, iterate=iterate_rules)
+                if apply_rules(advanced['rules'], g, iterate=iterate_rules) > 0:
+                    self.shacl_graph.clear_query_result_cache()
             try:
                 for s in shapes:
                     _is_conform, _reports = s.validate(g, abort_on_first=abort_on_first, allow_warnings=allow_warnings)
@@ -263,6 +272,7 @@ class Validator(object):
             finally:
                 if advanced:
                     unapply_functions(advanced['functions'], g)
+        self.shacl_graph.clear_query_result_cache()
         v_report, v_text = self.create_validation_report(self.shacl_graph, not non_conformant, reports)
         return (not non_conformant), v_report, v_text
 
@@ -395,6 +405,8 @@ def validate(
         loaded_sg = None
     use_js = kwargs.pop('js', None)
     iterate_rules = kwargs.pop('iterate_rules', False)
+    query_cache = kwargs.pop('query_cache', False)
+    parallel_queries = kwargs.pop('parallel_queries', False)
     if "abort_on_error" in kwargs:
         log.warning("Usage of abort_on_error is deprecated. Use abort_on_first instead.")
         ae = kwargs.pop("abort_on_error")
@@ -413,6 +425,8 @@ def validate(
                 'advanced': advanced,
                 'iterate_rules': iterate_rules,
                 'use_js': use_js,
+                'query_cache': query_cache,
+                'parallel_queries': parallel_queries,
                 'logger': log,
             },
         )
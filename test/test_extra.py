@@ -6,8 +6,13 @@
 # are added as required.
 import os
 import re
-from rdflib import Graph
+import threading
+from contextlib import contextmanager
+from rdflib import RDF, Graph, Literal, Namespace
+from rdflib.plugins.stores.memory import Memory
 from pyshacl import validate
+from pyshacl.constraints.sparql.sparql_based_constraint_components import AskConstraintValidator
+from pyshacl.helper.sparql_query_helper import SPARQLQueryHelper, prepare_query_with_prefixes, select_triple_pattern
 from pyshacl.errors import ReportableRuntimeError
 
 ontology_file_text = """
@@ -475,6 +480,385 @@ def test_sparql_message_subst():
     assert "#InvalidResource2 cannot have a http://www.w3.org/2000/01/rdf-schema#label of Invalid label 2" in s
     assert not conforms
 
+required_property_component_text = '''@prefix ex: <http://example.com/ex#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix sh: <http://www.w3.org/ns/shacl#> .
+
+ex:RequiredPropertyConstraintComponent
+  a sh:ConstraintComponent ;
+  sh:parameter [ sh:path ex:requiredProperty ] ;
+  sh:validator ex:RequiredPropertyValidator ;
+.
+ex:RequiredPropertyValidator
+  a sh:SPARQLAskValidator ;
+  sh:message "{$this} must have a {$requiredProperty}" ;
+  sh:ask """ASK { $this $requiredProperty ?any . }""" ;
+.
+'''
+
+
+@contextmanager
+def record_ask_validator_calls():
+    """
+    Record the focus node and the thread name of every AskConstraintValidator.validate() call.
+    """
+    calls = []
+    original_validate = AskConstraintValidator.validate
+
+    def recording_validate(self, focus, *args, **kwargs):
+        calls.append((focus, threading.current_thread().name))
+        return original_validate(self, focus, *args, **kwargs)
+
+    AskConstraintValidator.validate = recording_validate
+    try:
+        yield calls
+    finally:
+        AskConstraintValidator.validate = original_validate
+
+
+def test_sparql_constraint_component_query_cache():
+    sf = required_property_component_text + '''
+    ex:LabelledShape
+      a sh:NodeShape ;
+      ex:requiredProperty rdfs:label ;
+    .
+    ex:TestShape1
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      sh:node ex:LabelledShape ;
+    .
+    ex:TestShape2
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      sh:node ex:LabelledShape ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 rdfs:label "Resource 1" .'''
+    shacl_graph = Graph().parse(data=sf, format='turtle')
+    data_graph = Graph().parse(data=df, format='turtle')
+    with record_ask_validator_calls() as validate_calls:
+        conforms, graph, s = validate(data_graph, shacl_graph=shacl_graph, query_cache=True)
+        assert conforms
+        # ex:LabelledShape is checked on ex:Resource1 through both shapes, the second check uses the cached result
+        assert len(validate_calls) == 1
+        # Swap the label for a comment, so the data graph is the same size but no longer conforms
+        EX = Namespace("http://example.com/ex#")
+        RDFS = Namespace("http://www.w3.org/2000/01/rdf-schema#")
+        data_graph.remove((EX.Resource1, RDFS.label, None))
+        data_graph.add((EX.Resource1, RDFS.comment, Literal("Resource 1")))
+        conforms, graph, s = validate(data_graph, shacl_graph=shacl_graph, query_cache=True)
+        assert not conforms
+        assert len(validate_calls) == 2
+
+def test_sparql_constraint_component_query_cache_rules():
+    sf = required_property_component_text + '''
+    ex:LabelShape
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      ex:requiredProperty rdfs:label ;
+    .
+    ex:NoLabelShape
+      a sh:NodeShape ;
+      sh:not ex:LabelShape ;
+    .
+    ex:AddLabelRuleShape
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      sh:rule [
+        a sh:TripleRule ;
+        sh:subject sh:this ;
+        sh:predicate rdfs:label ;
+        sh:object "Added label" ;
+        sh:condition ex:NoLabelShape ;
+      ] ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 rdfs:comment "A resource with no label" .'''
+    # The rule condition checks ex:LabelShape before the rule adds the label, that result can't be used afterwards
+    conforms, graph, s = validate(
+        df, shacl_graph=sf, data_graph_format='turtle', shacl_graph_format='turtle', advanced=True, query_cache=True
+    )
+    assert conforms
+
+
+def test_sparql_constraint_component_messages_per_result():
+    sf = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    @prefix sh: <http://www.w3.org/ns/shacl#> .
+
+    ex:ForbiddenTextConstraintComponent
+      a sh:ConstraintComponent ;
+      sh:parameter [ sh:path ex:forbiddenText ] ;
+      sh:propertyValidator ex:ForbiddenTextValidator ;
+    .
+    ex:ForbiddenTextValidator
+      a sh:SPARQLSelectValidator ;
+      sh:message "Forbidden value {$value}" ;
+      sh:select """SELECT $this ?value WHERE {
+          $this $PATH ?value .
+          FILTER (contains(str(?value), $forbiddenText)) .
+      }""" ;
+    .
+    ex:TestShape
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      sh:property [
+        sh:path rdfs:comment ;
+        ex:forbiddenText "Comment" ;
+      ] ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 rdfs:comment "Comment 1", "Comment 2" .'''
+    conforms, graph, s = validate(df, shacl_graph=sf, data_graph_format='turtle', shacl_graph_format='turtle')
+    assert not conforms
+    SH = Namespace("http://www.w3.org/ns/shacl#")
+    results = list(graph.subjects(RDF.type, SH.ValidationResult))
+    assert len(results) == 2
+    for r in results:
+        # Each result only gets the message bound for its own value node
+        messages = list(graph.objects(r, SH.resultMessage))
+        assert len(messages) == 1
+        assert str(messages[0]) == "Forbidden value {}".format(graph.value(r, SH.value))
+
+def test_sparql_constraint_component_message_tokens():
+    sf = required_property_component_text.replace(
+        '"{$this} must have a {$requiredProperty}"', '"{$this} must have a {?requiredProperty}, {$unknown}"'
+    ) + '''
+    ex:TestShape
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      ex:requiredProperty rdfs:label ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    ex:Resource1 ex:name "Resource 1" .'''
+    conforms, graph, s = validate(df, shacl_graph=sf, data_graph_format='turtle', shacl_graph_format='turtle')
+    assert not conforms
+    SH = Namespace("http://www.w3.org/ns/shacl#")
+    messages = list(graph.objects(None, SH.resultMessage))
+    assert len(messages) == 1
+    # Every known token in the message is substituted, unknown tokens are left as they are
+    assert str(messages[0]) == (
+        "http://example.com/ex#Resource1 must have a http://www.w3.org/2000/01/rdf-schema#label, {$unknown}"
+    )
+
+def test_sparql_constraint_component_messages_without_tokens():
+    sf = required_property_component_text.replace(
+        '"{$this} must have a {$requiredProperty}"', '"Required property is missing"'
+    ) + '''
+    ex:TestShape
+      a sh:NodeShape ;
+      sh:targetClass ex:Resource ;
+      ex:requiredProperty rdfs:label ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    ex:Resource1 a ex:Resource .
+    ex:Resource2 a ex:Resource .'''
+    result_binds = []
+    original_bind_messages = SPARQLQueryHelper.bind_messages
+
+    def recording_bind_messages(self, param_map=None):
+        if param_map is not None:
+            result_binds.append(param_map)
+        return original_bind_messages(self, param_map)
+
+    SPARQLQueryHelper.bind_messages = recording_bind_messages
+    try:
+        conforms, graph, s = validate(df, shacl_graph=sf, data_graph_format='turtle', shacl_graph_format='turtle')
+    finally:
+        SPARQLQueryHelper.bind_messages = original_bind_messages
+    assert not conforms
+    # A message with nothing to substitute is not bound again for each result
+    assert len(result_binds) == 0
+    SH = Namespace("http://www.w3.org/ns/shacl#")
+    results = list(graph.subjects(RDF.type, SH.ValidationResult))
+    assert len(results) == 2
+    for r in results:
+        assert [str(m) for m in graph.objects(r, SH.resultMessage)] == ["Required property is missing"]
+
+def test_sparql_constraint_component_parallel_queries():
+    sf = required_property_component_text + '''
+    ex:TestShape
+      a sh:NodeShape ;
+      sh:targetClass ex:Resource ;
+      ex:requiredProperty rdfs:label ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 a ex:Resource ; rdfs:label "Resource 1" .
+    ex:Resource2 a ex:Resource .
+    ex:Resource3 a ex:Resource ; rdfs:label "Resource 3" .
+    ex:Resource4 a ex:Resource .'''
+    with record_ask_validator_calls() as validate_calls:
+        conforms, graph, s = validate(
+            df, shacl_graph=sf, data_graph_format='turtle', shacl_graph_format='turtle', parallel_queries=True
+        )
+    assert not conforms
+    SH = Namespace("http://www.w3.org/ns/shacl#")
+    EX = Namespace("http://example.com/ex#")
+    focus_nodes = set(graph.objects(None, SH.focusNode))
+    assert focus_nodes == {EX.Resource2, EX.Resource4}
+    # Every focus node was validated in the query thread pool
+    assert len(validate_calls) == 4
+    assert all(thread_name.startswith("pyshacl-query") for _, thread_name in validate_calls)
+
+def test_sparql_constraint_component_triple_pattern():
+    sf = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    @prefix sh: <http://www.w3.org/ns/shacl#> .
+
+    ex:NotAlsoOnConstraintComponent
+      a sh:ConstraintComponent ;
+      sh:parameter [ sh:path ex:notAlsoOn ] ;
+      sh:propertyValidator ex:NotAlsoOnValidator ;
+    .
+    ex:NotAlsoOnValidator
+      a sh:SPARQLSelectValidator ;
+      sh:select """SELECT $this ?value WHERE { $this $notAlsoOn ?value . }""" ;
+    .
+    ex:TestShape
+      a sh:NodeShape ;
+      sh:targetClass ex:Resource ;
+      sh:property [
+        sh:path rdfs:label ;
+        ex:notAlsoOn rdfs:comment ;
+      ] ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 a ex:Resource ; rdfs:label "One", "Uno" ; rdfs:comment "Uno" .
+    ex:Resource2 a ex:Resource ; rdfs:label "Two" ; rdfs:comment "Deux" .'''
+    conforms, graph, s = validate(df, shacl_graph=sf, data_graph_format='turtle', shacl_graph_format='turtle')
+    assert not conforms
+    SH = Namespace("http://www.w3.org/ns/shacl#")
+    EX = Namespace("http://example.com/ex#")
+    results = set(
+        (graph.value(r, SH.focusNode), graph.value(r, SH.value)) for r in graph.subjects(RDF.type, SH.ValidationResult)
+    )
+    assert results == {(EX.Resource1, Literal("Uno"))}
+    # The validator query is simple enough to be answered from graph.triples(), but these variations are not
+    prefixes = frozenset({('rdfs', 'http://www.w3.org/2000/01/rdf-schema#')})
+    simple = prepare_query_with_prefixes("SELECT $this ?value WHERE { $this $notAlsoOn ?value . }", prefixes)
+    assert select_triple_pattern(simple) is not None
+    for sparql_text in (
+        "SELECT $this ?value WHERE { $this $notAlsoOn ?value . FILTER (isIRI(?value)) }",
+        "SELECT DISTINCT $this ?value WHERE { $this $notAlsoOn ?value . }",
+        "SELECT $this ?value WHERE { $this rdfs:label/rdfs:comment ?value . }",
+    ):
+        assert select_triple_pattern(prepare_query_with_prefixes(sparql_text, prefixes)) is None
+
+
+class QueryTextOnlyStore(Memory):
+    """
+    Stands in for a store like SPARQLStore, that runs SPARQL queries itself and only accepts query text.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(QueryTextOnlyStore, self).__init__(*args, **kwargs)
+        self.queries = []
+
+    def query(self, query, initNs, initBindings, queryGraph, **kwargs):
+        assert isinstance(query, str)
+        self.queries.append(query)
+        # Let rdflib run the query text
+        raise NotImplementedError()
+
+
+def test_sparql_constraint_component_query_cache_shared():
+    sf = required_property_component_text + '''
+    ex:TestShape1
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      ex:requiredProperty rdfs:label ;
+    .
+    ex:TestShape2
+      a sh:NodeShape ;
+      sh:targetClass ex:Resource ;
+      ex:requiredProperty rdfs:label ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 a ex:Resource ; rdfs:comment "A resource with no label" .'''
+    shacl_graph = Graph().parse(data=sf, format='turtle')
+    store = QueryTextOnlyStore()
+    data_graph = Graph(store=store).parse(data=df, format='turtle')
+    conforms, graph, s = validate(data_graph, shacl_graph=shacl_graph, query_cache=True)
+    assert not conforms
+    SH = Namespace("http://www.w3.org/ns/shacl#")
+    EX = Namespace("http://example.com/ex#")
+    source_shapes = set(graph.objects(None, SH.sourceShape))
+    assert source_shapes == {EX.TestShape1, EX.TestShape2}
+    # Both shapes apply the same query to the same focus node, so it only ran once
+    assert len(store.queries) == 1
+
+
+def test_sparql_constraint_component_query_cache_shared_rules():
+    sf = required_property_component_text + '''
+    ex:LabelCheckShape
+      a sh:NodeShape ;
+      ex:requiredProperty rdfs:label ;
+    .
+    ex:NoLabelShape
+      a sh:NodeShape ;
+      sh:not ex:LabelCheckShape ;
+    .
+    ex:AddLabelRuleShape
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      sh:rule [
+        a sh:TripleRule ;
+        sh:subject sh:this ;
+        sh:predicate rdfs:label ;
+        sh:object "Added label" ;
+        sh:condition ex:NoLabelShape ;
+      ] ;
+    .
+    ex:TestShape
+      a sh:NodeShape ;
+      sh:targetNode ex:Resource1 ;
+      ex:requiredProperty rdfs:label ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 rdfs:comment "A resource with no label" .'''
+    # ex:LabelCheckShape (checked before the rule) and ex:TestShape (checked after it) share their query results,
+    # so ex:TestShape must not get the result from before the rule added the label
+    with record_ask_validator_calls() as validate_calls:
+        conforms, graph, s = validate(
+            df,
+            shacl_graph=sf,
+            data_graph_format='turtle',
+            shacl_graph_format='turtle',
+            advanced=True,
+            query_cache=True,
+        )
+    assert conforms
+    assert len(validate_calls) == 2
+
+
+def test_sparql_constraint_component_store_query_text():
+    sf = required_property_component_text + '''
+    ex:TestShape
+      a sh:NodeShape ;
+      sh:targetClass ex:Resource ;
+      ex:requiredProperty rdfs:label ;
+    .'''
+    df = '''@prefix ex: <http://example.com/ex#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    ex:Resource1 a ex:Resource ; rdfs:label "Resource 1" .
+    ex:Resource2 a ex:Resource .'''
+    store = QueryTextOnlyStore()
+    data_graph = Graph(store=store).parse(data=df, format='turtle')
+    conforms, graph, s = validate(data_graph, shacl_graph=sf, shacl_graph_format='turtle')
+    assert not conforms
+    assert len(store.queries) == 2
+    EX = Namespace("http://example.com/ex#")
+    SH = Namespace("http://www.w3.org/ns/shacl#")
+    assert set(graph.objects(None, SH.focusNode)) == {EX.Resource2}
+
+
 if __name__ == "__main__":
     test_validate_with_ontology()
     test_validate_with_ontology_fail1()
@@ -489,4 +873,13 @@ if __name__ == "__main__":
     test_owl_imports()
     test_owl_imports_fail()
     test_sparql_message_subst()
-
+    test_sparql_constraint_component_query_cache()
+    test_sparql_constraint_component_query_cache_rules()
+    test_sparql_constraint_component_messages_per_result()
+    test_sparql_constraint_component_message_tokens()
+    test_sparql_constraint_component_messages_without_tokens()
+    test_sparql_constraint_component_parallel_queries()
+    test_sparql_constraint_component_triple_pattern()
+    test_sparql_constraint_component_query_cache_shared()
+    test_sparql_constraint_component_query_cache_shared_rules()
+    test_sparql_constraint_component_store_query_text()